@@ -15,10 +15,12 @@ from .task_execution import (
     EntryRequirement,
     RemoteSubgraph,
     TaskRunnerEntry,
+    initialize_task_states,
+    refresh_all_persistent_cache_state_for_task_states,
 )
 from ..exception import AttributeValidationError
 from ..utils.keyed_priority_stack import KeyedPriorityStack
-from ..utils.misc import oneline, SynchronizedSet
+from ..utils.misc import oneline, SizeBoundedLruCache, SynchronizedSet
 
 
 # TODO At some point it might be good to have the option of Bionic handling its
@@ -28,11 +30,30 @@ from ..utils.misc import oneline, SynchronizedSet
 logger = logging.getLogger(__name__)
 
 
-def run_in_subprocess(task_completion_runner, states):
+def run_in_subprocess(task_completion_runner, states, persisted_value_cache_size=0):
+    if persisted_value_cache_size > 0:
+        task_completion_runner.use_persisted_value_cache(
+            get_worker_persisted_value_cache(persisted_value_cache_size)
+        )
     task_completion_runner.run(states)
     return [state.task_key for state in states]
 
 
+# Each worker process keeps a cache of deserialized persisted values, which lasts
+# across all the tasks it runs. This way, if many tasks depend on the same value,
+# a worker only needs to load it once.
+_worker_persisted_value_cache = None
+
+
+def get_worker_persisted_value_cache(max_size):
+    global _worker_persisted_value_cache
+    if _worker_persisted_value_cache is None:
+        _worker_persisted_value_cache = SizeBoundedLruCache(max_size)
+    else:
+        _worker_persisted_value_cache.max_size = max_size
+    return _worker_persisted_value_cache
+
+
 class TaskCompletionRunner:
     """
     Computes a DAG of `TaskState` objects.
@@ -42,8 +63,8 @@ class TaskCompletionRunner:
     this would be a simple as doing a topological sort and then computing the tasks
     in order. However, there are several complicating factors:
 
-    - Some tasks should be run asynchronously in a separate process to allow
-      parallelism.
+    - Some tasks should be run asynchronously in a separate process or thread to
+      allow parallelism.
     - Some task outputs can't be serialized, which means those tasks need to be
       re-computed in each process that needs them.
     - If a task's value is cached, we want to load it as quickly as possible, without
@@ -64,6 +85,14 @@ class TaskCompletionRunner:
         self._pending_entries_kps = KeyedPriorityStack()
         self._in_progress_entries = set()
         self._blocked_entries = set()
+        # These track in-progress entries being computed in a separate thread of this
+        # process.
+        self._thread_computations_by_future = {}
+
+    def use_persisted_value_cache(self, persisted_value_cache):
+        self._context = self._context.evolve(
+            persisted_value_cache=persisted_value_cache
+        )
 
     @property
     def _parallel_execution_enabled(self):
@@ -73,11 +102,17 @@ class TaskCompletionRunner:
     def _aip_execution_enabled(self):
         return self._context.core.aip_executor is not None
 
+    @property
+    def _thread_execution_enabled(self):
+        return self._context.core.thread_executor is not None
+
     def run(self, states):
         try:
             if self._parallel_execution_enabled:
                 self._context.core.process_executor.start_logging()
 
+            self._prefetch_persistent_cache_state(states)
+
             for state in states:
                 entry = self._get_or_create_entry_for_state(state)
                 self._add_requirement(
@@ -317,6 +352,7 @@ class TaskCompletionRunner:
             new_core = self._context.core.evolve(
                 aip_executor=None,
                 process_executor=None,
+                thread_executor=None,
             )
             new_context = self._context.evolve(
                 core=new_core,
@@ -348,10 +384,12 @@ class TaskCompletionRunner:
                 future.add_done_callback(done_callback)
             else:
                 new_task_completion_runner = TaskCompletionRunner(new_context)
-                future = self._context.core.process_executor.submit(
+                process_executor = self._context.core.process_executor
+                future = process_executor.submit(
                     run_in_subprocess,
                     new_task_completion_runner,
                     stripped_active_target_states,
+                    process_executor.persisted_value_cache_size,
                 )
 
             for target_entry in active_target_entries:
@@ -370,17 +408,138 @@ class TaskCompletionRunner:
         if self._mark_entry_blocked_if_necessary(entry):
             return
 
+        # If possible, we'll run the computation in a separate thread, so we can move
+        # on to other entries in the meantime. (It's not worth doing this for
+        # trivial tasks.)
+        entry_is_computable_in_thread = (
+            self._thread_execution_enabled
+            and not entry.state.task.is_simple_lookup
+            and not entry.state.output_would_be_missing()
+        )
+        if entry_is_computable_in_thread:
+            self._compute_entry_in_thread(entry)
+            return
+
         entry.compute(self._context)
         assert self._mark_entry_completed_if_possible(entry)
 
+    def _compute_entry_in_thread(self, entry):
+        # We load the dependency values here in the main thread, since loading them
+        # can modify their task states.
+        computation = ThreadComputation(
+            entry=entry,
+            context=self._context,
+            dep_results=entry.get_dep_results(self._context),
+        )
+
+        thread_executor = self._context.core.thread_executor
+        future = thread_executor.submit(computation.run)
+        self._thread_computations_by_future[future] = computation
+        self._mark_entry_in_progress(entry, future)
+
+        # Each in-progress computation holds its dependency values in memory, so we
+        # don't want to queue up many more computations than we have threads to run
+        # them.
+        while len(self._thread_computations_by_future) > thread_executor.worker_count:
+            self._wait_on_in_progress_entries()
+
+    def _prefetch_persistent_cache_state(self, states):
+        """
+        Looks up the persistent cache state of the provided states and their
+        ancestors in bulk, one layer of the graph at a time.
+
+        Normally each entry's cached artifacts are looked up individually when the
+        entry is processed. When a query touches many tasks, it's much cheaper to
+        look up all the artifacts in a layer together, so we do that here, in two
+        passes:
+
+        1. Starting from the requested states, we walk up through each dependency
+           that isn't already cached, creating entries (and refreshing their cache
+           state) one layer at a time.
+        2. Starting from the top of the graph and working downward, we initialize
+           each layer of states whose dependencies are primed, and check whether
+           their values are already persisted.
+
+        This only does work that would be done anyway when processing the entries,
+        so it doesn't change the outcome of the run; any states that can't be
+        handled here (e.g., because their dependencies need to be computed first)
+        are handled normally afterwards.
+        """
+
+        reachable_states = []
+        reachable_task_keys = set()
+        next_states = states
+        while next_states:
+            layer_states = []
+            for state in next_states:
+                if state.task_key in reachable_task_keys:
+                    continue
+                reachable_task_keys.add(state.task_key)
+                layer_states.append(state)
+            reachable_states.extend(layer_states)
+
+            next_states = [
+                dep_state
+                for entry in self._get_or_create_entries_for_states(layer_states)
+                if entry.level < EntryLevel.CACHED
+                for dep_state in entry.state.dep_states
+            ]
+
+        # Now we assign each state to a layer numbered by the length of the longest
+        # path from it to the top of the graph, so that each state only depends on
+        # states in lower layers.
+        layer_ixs_by_task_key = {}
+        for reachable_state in reachable_states:
+            stack = [(reachable_state, False)]
+            while stack:
+                state, deps_are_done = stack.pop()
+                if state.task_key in layer_ixs_by_task_key:
+                    continue
+                dep_states = [
+                    dep_state
+                    for dep_state in state.dep_states
+                    if dep_state.task_key in reachable_task_keys
+                ]
+                if deps_are_done:
+                    layer_ixs_by_task_key[state.task_key] = 1 + max(
+                        (
+                            layer_ixs_by_task_key[dep_state.task_key]
+                            for dep_state in dep_states
+                        ),
+                        default=-1,
+                    )
+                else:
+                    stack.append((state, True))
+                    stack.extend((dep_state, False) for dep_state in dep_states)
+
+        states_by_layer_ix = {}
+        for state in reachable_states:
+            layer_ix = layer_ixs_by_task_key[state.task_key]
+            states_by_layer_ix.setdefault(layer_ix, []).append(state)
+
+        for layer_ix in sorted(states_by_layer_ix.keys()):
+            states_to_initialize = [
+                state
+                for state in states_by_layer_ix[layer_ix]
+                if not state.is_initialized
+                and all(
+                    self._entries_by_task_key[dep_state.task_key].level
+                    >= EntryLevel.PRIMED
+                    for dep_state in state.dep_states
+                )
+            ]
+            initialize_task_states(states_to_initialize, self._context)
+            for state in states_to_initialize:
+                if state.should_persist:
+                    state.attempt_to_access_persistent_cached_value()
+
     def _set_up_entry_dependencies(self, entry):
         if entry.dep_entries is not None:
             return
 
-        entry.dep_entries = [
-            self._get_or_create_entry_for_state(dep_state)
-            for dep_state in entry.state.dep_states
-        ]
+        entry.dep_entries = self._get_or_create_entries_for_states(
+            entry.state.dep_states
+        )
 
     def _add_requirement(
         self,
@@ -425,18 +584,27 @@ class TaskCompletionRunner:
                 self._raise_entry_priority(req.dst_entry, new_priority)
 
     def _get_or_create_entry_for_state(self, state):
-        task_key = state.task_key
-        if task_key in self._entries_by_task_key:
-            return self._entries_by_task_key[task_key]
-        # Before doing anything with this task state, we should make sure its
+        (entry,) = self._get_or_create_entries_for_states([state])
+        return entry
+
+    def _get_or_create_entries_for_states(self, states):
+        new_states_by_task_key = {
+            state.task_key: state
+            for state in states
+            if state.task_key not in self._entries_by_task_key
+        }
+        # Before doing anything with these task states, we should make sure their
         # cache state is up to date.
         # TODO Having to clear the state with each get() call is brittle. It would
         # probably be better to store this cache/artifact state in the ExecutionContext
         # so it will automatically get thrown away at the end of the query.
-        state.refresh_all_persistent_cache_state(self._context)
-        entry = TaskRunnerEntry(self._context, state)
-        self._entries_by_task_key[task_key] = entry
-        return entry
+        refresh_all_persistent_cache_state_for_task_states(
+            new_states_by_task_key.values(), self._context
+        )
+        for task_key, state in new_states_by_task_key.items():
+            self._entries_by_task_key[task_key] = TaskRunnerEntry(self._context, state)
+
+        return [self._entries_by_task_key[state.task_key] for state in states]
 
     def _has_pending_entries(self):
         # While there are no entries in the to-process stack but have any in-progress ones,
@@ -472,9 +640,7 @@ class TaskCompletionRunner:
         )
         for finished_future in finished_futures:
             try:
-                self._sync_and_complete_remotely_computed_task_keys(
-                    finished_future.result()
-                )
+                self._complete_finished_future(finished_future)
             except Exception as exception:
                 # If there is an error, wait until all futures are done. With
                 # AIP execution, we can have one task fail while others are
@@ -500,9 +666,7 @@ class TaskCompletionRunner:
                 # of the other errors as well.
                 for future in finished_futures:
                     try:
-                        self._sync_and_complete_remotely_computed_task_keys(
-                            future.result()
-                        )
+                        self._complete_finished_future(future)
                     except Exception as e:
                         if e != exception and e is not None:
                             logger.exception(
@@ -517,6 +681,15 @@ class TaskCompletionRunner:
 
                 raise exception
 
+    def _complete_finished_future(self, future):
+        if future in self._thread_computations_by_future:
+            computation = self._thread_computations_by_future.pop(future)
+            future.result()
+            computation.save_result()
+            assert self._mark_entry_completed_if_possible(computation.entry)
+        else:
+            self._sync_and_complete_remotely_computed_task_keys(future.result())
+
     def _sync_and_complete_remotely_computed_task_keys(self, task_keys):
         for task_key in task_keys:
             entry = self._entries_by_task_key[task_key]
@@ -647,7 +820,12 @@ class TaskCompletionRunner:
                 req
                 for req in remaining_reqs
                 if req.src_entry is not None
-                and req.src_entry.priority > EntryPriority.NORMAL
+                and (
+                    req.src_entry.priority > EntryPriority.NORMAL
+                    # An entry being computed in another thread is already using
+                    # this value, so there's no point in evicting it.
+                    or req.src_entry.stage == EntryStage.IN_PROGRESS
+                )
             ]
         if len(remaining_reqs) > 0:
             return
@@ -691,6 +869,35 @@ class TaskCompletionRunner:
         self._in_progress_entries.add(in_progress_entry)
 
 
+class ThreadComputation:
+    """
+    Computes a TaskRunnerEntry in a separate thread.
+
+    A thread pool can keep references to a task's arguments and return value for a
+    short time after the task finishes, which would delay garbage collection of
+    potentially large values. To avoid this, we keep the dependency results and
+    the output on this object, and clear them as soon as they're no longer needed.
+    """
+
+    def __init__(self, entry, context, dep_results):
+        self.entry = entry
+        self._context = context
+        self._dep_results = dep_results
+        self._result_and_value_hash = None
+
+    def run(self):
+        dep_results = self._dep_results
+        self._dep_results = None
+        self._result_and_value_hash = self.entry.compute_detached(
+            self._context, dep_results
+        )
+
+    def save_result(self):
+        result, value_hash = self._result_and_value_hash
+        self._result_and_value_hash = None
+        self.entry.save_computed_result(result, value_hash)
+
+
 class TaskKeyLogger:
     """
     Logs how we derived each task key. The purpose of this class is to make sure that
@@ -775,6 +982,9 @@ class ExecutionContext:
     # Currently we only do this for entities where both persistence and memoization are
     # disabled.
     temp_result_cache = attr.ib()
+    # This is used for keeping deserialized persisted values in memory across multiple
+    # executions. Currently we only do this in parallel worker processes.
+    persisted_value_cache = attr.ib(default=None)
 
     def evolve(self, **kwargs):
         return attr.evolve(self, **kwargs)
@@ -32,7 +32,7 @@ from ..exception import (
     UnsupportedSerializedValueError,
 )
 from ..persistence import Provenance, ProvenanceDigest
-from ..utils.files import ensure_parent_dir_exists
+from ..utils.files import ensure_parent_dir_exists, get_path_size
 from ..utils.misc import hash_simple_obj_to_hex, oneline
 from ..utils.urls import path_from_url, url_from_path
 
@@ -141,6 +141,34 @@ class TaskRunnerEntry:
         the task's dependencies are already computed.
         """
 
+        dep_results = self.get_dep_results(context)
+        result, value_hash = self.compute_detached(context, dep_results)
+        self.save_computed_result(result, value_hash)
+
+    def get_dep_results(self, context):
+        """
+        Returns the results of all the task's dependencies, which must already be
+        computed.
+        """
+
+        dep_results = []
+        for dep_entry in self.dep_entries:
+            assert dep_entry._is_cached
+            dep_result = dep_entry.get_cached_result(context)
+            dep_results.append(dep_result)
+        return dep_results
+
+    def compute_detached(self, context, dep_results):
+        """
+        Runs the entry's task on the provided dependency results, persisting the
+        output if appropriate, and returns a tuple of the computed result and its
+        value hash (or None if the value isn't persisted).
+
+        This doesn't modify the entry or its task state, so it's safe to call from a
+        separate thread; the returned values should then be passed to
+        ``save_computed_result`` in the main thread.
+        """
+
         # TODO There are a few cases here where we acccess private members on
         # self.state; should we clean this up?
 
@@ -153,12 +181,6 @@ class TaskRunnerEntry:
 
         assert task is not None, (state.task_key, self.level)
 
-        dep_results = []
-        for dep_entry, dep_key in zip(self.dep_entries, task.dep_keys):
-            assert dep_entry._is_cached
-            dep_result = dep_entry.get_cached_result(context)
-            dep_results.append(dep_result)
-
         if not task.is_simple_lookup:
             context.task_key_logger.log_computing(state.task_key)
 
@@ -173,11 +195,7 @@ class TaskRunnerEntry:
                 value_is_missing=True,
             )
             value_hash = ""
-            # TODO Should we do this even when memoization is disabled?
-            state._result = result
-            if state.should_persist:
-                state._result_value_hash = value_hash
-            return result
+            return result, value_hash
 
         else:
             # If we have no missing outputs, we should not be consuming any missing
@@ -203,7 +221,26 @@ class TaskRunnerEntry:
         if state.should_persist:
             artifact = state._local_artifact_from_value(result.value, context)
             state._cache_accessor.save_local_artifact(artifact)
-            state._result_value_hash = artifact.content_hash
+            return result, artifact.content_hash
+
+        return result, None
+
+    def save_computed_result(self, result, value_hash):
+        """
+        Records a result returned by ``compute_detached`` on this entry and its task
+        state.
+        """
+
+        state = self.state
+
+        if result.value_is_missing:
+            # TODO Should we do this even when memoization is disabled?
+            state._result = result
+            if state.should_persist:
+                state._result_value_hash = value_hash
+
+        elif state.should_persist:
+            state._result_value_hash = value_hash
 
         # If we're not persisting the result, this is our only chance to memoize it;
         # otherwise, we can memoize it later if/when we load it from get_cached_result.
@@ -271,7 +308,7 @@ class EntryStage(Enum):
     BLOCKED = auto()
 
     """
-    The entry is currently being computed in another process.
+    The entry is currently being computed in another process or thread.
 
     Valid next stages: [COMPLETED]
     """
@@ -489,6 +526,25 @@ class TaskState:
             context.task_key_logger.log_accessed_from_memory(self.task_key)
             return self._result
 
+        # If we're allowed to memoize this value, we can also share it with other
+        # executions via the persisted value cache, if there is one. (We include the
+        # flow instance in the key so that values are only shared in cases where
+        # memoization would have shared them too.)
+        value_cache = context.persisted_value_cache
+        if value_cache is not None and self.should_memoize:
+            value_cache_key = (
+                context.flow_instance_uuid,
+                self.task_key,
+                self._result_value_hash,
+            )
+            result = value_cache.get(value_cache_key)
+            if result is not None:
+                context.task_key_logger.log_accessed_from_memory(self.task_key)
+                self._result = result
+                return result
+        else:
+            value_cache = None
+
         local_artifact = self._cache_accessor.replicate_and_load_local_artifact()
         value = self._value_from_local_artifact(local_artifact)
         result = Result(
@@ -502,6 +558,12 @@ class TaskState:
         if self.should_memoize:
             self._result = result
 
+        if value_cache is not None:
+            # We don't know how much memory the deserialized value takes up, so we
+            # use the size of its file(s) as an estimate.
+            value_size = get_path_size(path_from_url(local_artifact.url))
+            value_cache.put(value_cache_key, result, value_size)
+
         return result
 
     def attempt_to_access_persistent_cached_value(self):
@@ -521,12 +583,14 @@ class TaskState:
 
         self._load_value_hash()
 
-    def refresh_all_persistent_cache_state(self, context):
+    def refresh_all_persistent_cache_state(self, context, cache_accessor=None):
         """
         Refreshes all state that depends on the persistent cache.
 
         This is useful if the external cache state might have changed since we last
-        worked with this task.
+        worked with this task. If ``cache_accessor`` is provided (e.g., because it
+        was created in bulk by ``PersistentCache.prefetch_accessors``), it's used
+        instead of creating a new one.
         """
 
         # If this task state is not initialized or not persisted, there's nothing to
@@ -534,7 +598,7 @@ class TaskState:
         if not self.is_initialized or not self.should_persist:
             return
 
-        self.refresh_cache_accessor(context)
+        self.refresh_cache_accessor(context, cache_accessor)
 
         # If we haven't loaded anything from the cache, we can stop here.
         if self._result_value_hash is None:
@@ -574,13 +638,36 @@ class TaskState:
         if self._result_value_hash is None:
             self._load_value_hash()
 
-    def initialize(self, context):
-        "Initializes the task state to get it ready for completion."
+    def initialize(self, context, cache_accessor=None):
+        """
+        Initializes the task state to get it ready for completion.
+
+        If ``cache_accessor`` is provided, it's used instead of creating a new one;
+        this requires that the provenance has already been set up with
+        ``set_up_provenance``.
+        """
 
         if self.is_initialized:
             return
 
         # First,  set up the provenance.
+        if cache_accessor is None:
+            self.set_up_provenance(context)
+        else:
+            assert cache_accessor.provenance is self._provenance
+
+        # Lastly, set up cache accessors.
+        if self.should_persist:
+            self.refresh_cache_accessor(context, cache_accessor)
+
+        self.is_initialized = True
+
+    def set_up_provenance(self, context):
+        """
+        Computes and returns this task's provenance. All of the task's dependencies
+        must be primed.
+        """
+
         dep_provenance_digests_by_task_key = {
             dep_key: dep_state._get_digest()
             for dep_key, dep_state in zip(self.task.dep_keys, self.dep_states)
@@ -596,14 +683,9 @@ class TaskState:
             can_functionally_change_per_run=self.func_attrs.changes_per_run,
             flow_instance_uuid=context.flow_instance_uuid,
         )
+        return self._provenance
 
-        # Lastly, set up cache accessors.
-        if self.should_persist:
-            self.refresh_cache_accessor(context)
-
-        self.is_initialized = True
-
-    def refresh_cache_accessor(self, context):
+    def refresh_cache_accessor(self, context, cache_accessor=None):
         """
         Initializes the cache acessor for this task state.
 
@@ -613,10 +695,12 @@ class TaskState:
         in order to wipe this state and allow it get back in sync with the real world.
         """
 
-        self._cache_accessor = context.core.persistent_cache.get_accessor(
-            task_key=self.task_key,
-            provenance=self._provenance,
-        )
+        if cache_accessor is None:
+            cache_accessor = context.core.persistent_cache.get_accessor(
+                task_key=self.task_key,
+                provenance=self._provenance,
+            )
+        self._cache_accessor = cache_accessor
         if context.core.versioning_policy.check_for_bytecode_errors:
             self._check_accessor_for_version_problems()
 
@@ -742,7 +826,7 @@ class TaskState:
 
         ensure_parent_dir_exists(value_path)
         try:
-            protocol.write(value, value_path)
+            value_token = protocol.write_and_tokenize(value, value_path)
         except Exception as e:
             # TODO Should we rename this to just SerializationError?
             raise EntitySerializationError(
@@ -754,17 +838,14 @@ class TaskState:
                 )
             ) from e
 
-        value_hash = self._generate_value_hash(value, value_path, context)
+        value_hash = self._generate_value_hash(value, value_token, context)
         return Artifact(
             url=url_from_path(value_path),
             content_hash=value_hash,
         )
         return value_path
 
-    def _generate_value_hash(self, value, value_path, context):
-        protocol = self.desc_metadata.protocol
-        value_hash = protocol.tokenize_file(value_path)
-
+    def _generate_value_hash(self, value, value_token, context):
         def _extra_value_hash():
             code_versioning_policy = self.func_attrs.code_versioning_policy
             code_version = code_versioning_policy.version
@@ -786,7 +867,7 @@ class TaskState:
                     return ""
                 raise
 
-        return hash_simple_obj_to_hex([value_hash, _extra_value_hash()])
+        return hash_simple_obj_to_hex([value_token, _extra_value_hash()])
 
     def _value_from_local_artifact(self, local_artifact):
         file_path = path_from_url(local_artifact.url)
@@ -806,6 +887,59 @@ class TaskState:
             )
 
 
+def initialize_task_states(states, context):
+    """
+    Initializes each of the provided TaskStates. This is equivalent to calling
+    ``initialize`` on each state, except that the persistent cache lookups are all
+    done together.
+    """
+
+    states = [state for state in states if not state.is_initialized]
+    for state in states:
+        state.set_up_provenance(context)
+
+    persisted_states = [state for state in states if state.should_persist]
+    cache_accessors_by_task_key = _prefetch_cache_accessors(persisted_states, context)
+
+    for state in states:
+        if state.should_persist:
+            state.initialize(context, cache_accessors_by_task_key[state.task_key])
+        else:
+            state.initialize(context)
+
+
+def refresh_all_persistent_cache_state_for_task_states(states, context):
+    """
+    Refreshes the persistent cache state for each of the provided TaskStates. This
+    is equivalent to calling ``refresh_all_persistent_cache_state`` on each state,
+    except that the persistent cache lookups are all done together.
+    """
+
+    states = [
+        state for state in states if state.is_initialized and state.should_persist
+    ]
+    cache_accessors_by_task_key = _prefetch_cache_accessors(states, context)
+
+    for state in states:
+        state.refresh_all_persistent_cache_state(
+            context, cache_accessors_by_task_key[state.task_key]
+        )
+
+
+def _prefetch_cache_accessors(states, context):
+    # If there's only a single state, there's nothing to gain by doing a bulk lookup,
+    # so we'll let the state create its own accessor.
+    if len(states) < 2:
+        return {state.task_key: None for state in states}
+
+    cache_accessors = context.core.persistent_cache.prefetch_accessors(
+        (state.task_key, state._provenance) for state in states
+    )
+    return {
+        cache_accessor.task_key: cache_accessor for cache_accessor in cache_accessors
+    }
+
+
 class RemoteSubgraph:
     """
     Represents a subset of a task graph to be computed remotely (i.e., in another
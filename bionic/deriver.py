@@ -322,6 +322,7 @@ class EntityDeriver:
             versioning_policy=self._compute_core_entity("core__versioning_policy"),
             aip_executor=self._compute_core_entity("core__aip_executor"),
             process_executor=self._compute_core_entity("core__process_executor"),
+            thread_executor=self._compute_core_entity("core__thread_executor"),
             gcs_fs=self._compute_core_entity("core__persistent_cache__gcs__fs"),
             should_memoize_default=self._compute_core_entity(
                 "core__memoize_by_default"
@@ -710,6 +711,7 @@ class ExecutionCore:
     versioning_policy = attr.ib()
     aip_executor = attr.ib()
     process_executor = attr.ib()
+    thread_executor = attr.ib()
     gcs_fs = attr.ib()
     should_memoize_default = attr.ib(type=bool)
     should_persist_default = attr.ib(type=bool)
@@ -729,6 +731,7 @@ BOOTSTRAP_CORE = ExecutionCore(
     ),
     aip_executor=None,
     process_executor=None,
+    thread_executor=None,
     gcs_fs=None,
     should_memoize_default=True,
     should_persist_default=False,
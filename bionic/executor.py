@@ -7,6 +7,7 @@ work in a parallel setting.
 
 import copy
 import logging
+import os
 import queue
 import re
 import sys
@@ -17,6 +18,9 @@ from functools import partial
 from multiprocessing.managers import SyncManager
 from uuid import uuid4
 
+import attr
+import pyrsistent
+
 from .aip.task import Task
 from .deps.optdep import import_optional_dependency
 from .utils.misc import oneline, SynchronizedSet
@@ -61,8 +65,11 @@ class ProcessExecutor:
     to work seamlessly.
     """
 
-    def __init__(self, worker_count):
+    def __init__(self, worker_count, persisted_value_cache_size=0):
         self.worker_count = worker_count
+        # Each worker process will keep up to this many bytes of deserialized
+        # persisted values in memory, to be reused by subsequent tasks.
+        self.persisted_value_cache_size = persisted_value_cache_size
         self._manager = get_singleton_manager()
         self._process_pool_exec = None
         self._init_or_resize_process_pool()
@@ -86,12 +93,14 @@ class ProcessExecutor:
         self._process_pool_exec = loky.get_reusable_executor(
             max_workers=self.worker_count,
             initializer=logging_initializer,
-            initargs=(self._manager.logging_queue,),
+            initargs=self._manager.logging_initargs,
         )
 
     def submit(self, fn, *args, **kwargs):
         self._init_or_resize_process_pool()
-        return self._process_pool_exec.submit(fn, *args, **kwargs)
+        return self._process_pool_exec.submit(
+            run_in_worker, self._manager.logging_levels_version, fn, *args, **kwargs
+        )
 
     def create_synchronized_set(self):
         return self._manager.create_synchronized_set()
@@ -103,6 +112,28 @@ class ProcessExecutor:
         self._manager.remove_logging_listener()
 
 
+class ThreadExecutor:
+    """
+    Runs tasks concurrently in a pool of threads inside the current process.
+
+    Unlike the ProcessExecutor, this doesn't require any values or functions to be
+    serialized, but tasks only run in parallel if they spend their time waiting on
+    I/O or in code that releases the GIL.
+    """
+
+    def __init__(self, worker_count):
+        if worker_count is None:
+            # This is the same default that ThreadPoolExecutor uses.
+            worker_count = min(32, (os.cpu_count() or 1) + 4)
+        self.worker_count = worker_count
+        self._thread_pool_exec = ThreadPoolExecutor(
+            max_workers=worker_count, thread_name_prefix="bionic-worker"
+        )
+
+    def submit(self, fn, *args, **kwargs):
+        return self._thread_pool_exec.submit(fn, *args, **kwargs)
+
+
 _manager = None
 
 
@@ -134,7 +165,37 @@ class ExternalProcessLoggingManager:
         self.logging_queue = self._process_manager.Queue(-1)
         self._logging_receiver = LoggingReceiver(self.logging_queue)
 
+        # The worker processes use this to decide which log records are worth
+        # sending back to us; it's shared through the process manager and updated
+        # whenever our logging configuration changes.
+        self.logging_levels = self._process_manager.dict()
+        self.logging_levels_version = 0
+        self._published_logging_levels = None
+        self.publish_logging_levels()
+
+    @property
+    def logging_initargs(self):
+        return (self.logging_queue, self.logging_levels)
+
+    def publish_logging_levels(self):
+        """
+        Makes the current logging configuration of this process visible to the
+        worker processes. Workers only check for a new configuration when they
+        receive a task with a newer ``logging_levels_version``, so this is cheap
+        when nothing has changed.
+        """
+
+        levels = LoggingLevels.from_current_process()
+        if levels == self._published_logging_levels:
+            return
+        self.logging_levels_version += 1
+        self.logging_levels.update(
+            version=self.logging_levels_version, levels=levels.as_dict()
+        )
+        self._published_logging_levels = levels
+
     def add_logging_listener(self):
+        self.publish_logging_levels()
         self._logging_receiver.add_listener()
 
     def remove_logging_listener(self):
@@ -144,7 +205,7 @@ class ExternalProcessLoggingManager:
         return self._process_manager.SynchronizedSet()
 
 
-def logging_initializer(logging_queue):
+def logging_initializer(logging_queue, logging_levels):
     # NOTE when adding a new executor, revisit this logger logic since
     # logging might behave differently in a different process pool like
     # multiprocessing.ProcessPoolExecutor.
@@ -165,32 +226,161 @@ def logging_initializer(logging_queue):
     orig_handlers = logger.handlers
     for orig_handler in orig_handlers:
         logger.removeHandler(orig_handler)
-    logger.addHandler(WorkerProcessLogHandler(logging_queue))
+    global _worker_log_handler
+    _worker_log_handler = WorkerProcessLogHandler(logging_queue, logging_levels)
+    logger.addHandler(_worker_log_handler)
 
-    # We want the subprocess to forward all messages to the queue and
-    # let the receiver in main process take care of logging at the
-    # appropriate logging level.
+    # We want the subprocess to pass all messages to our handler, which checks
+    # them against the main process's logging levels before forwarding them to
+    # the queue.
     logger.setLevel(logging.DEBUG)
 
     if warning is not None:
         logger.warn(oneline(warning))
 
 
+_worker_log_handler = None
+
+
+def run_in_worker(logging_levels_version, fn, *args, **kwargs):
+    """
+    Runs a function submitted by a ProcessExecutor in a worker process, making sure
+    the worker's log handler is up to date before it starts and that all its log
+    records have been sent to the main process when it finishes.
+    """
+
+    handler = _worker_log_handler
+    if handler is None:
+        return fn(*args, **kwargs)
+
+    handler.refresh_levels(logging_levels_version)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        handler.flush()
+
+
+@attr.s(frozen=True)
+class LoggingLevels:
+    """
+    A snapshot of which log records a process's loggers will accept.
+
+    ``levels_by_name`` holds the effective level of each logger that exists in
+    the process; records from other loggers are checked against their nearest
+    existing ancestor, which is what they'll inherit when the receiving process
+    creates them.
+    """
+
+    levels_by_name = attr.ib(converter=pyrsistent.pmap)
+    disabled_names = attr.ib(converter=frozenset)
+    disable_level = attr.ib()
+
+    @classmethod
+    def from_current_process(cls):
+        manager = logging.root.manager
+        levels_by_name = {logging.root.name: logging.root.getEffectiveLevel()}
+        disabled_names = set()
+        for name, logger in list(manager.loggerDict.items()):
+            # The logger dict can also contain placeholders for loggers that
+            # haven't been created yet.
+            if not isinstance(logger, logging.Logger):
+                continue
+            levels_by_name[name] = logger.getEffectiveLevel()
+            if logger.disabled:
+                disabled_names.add(name)
+        return cls(
+            levels_by_name=levels_by_name,
+            disabled_names=disabled_names,
+            disable_level=manager.disable,
+        )
+
+    @classmethod
+    def from_dict(cls, dict_):
+        return cls(**dict_)
+
+    def as_dict(self):
+        # We send plain builtin types to the process manager, so it doesn't need
+        # to know about this class.
+        return dict(
+            levels_by_name=dict(self.levels_by_name),
+            disabled_names=set(self.disabled_names),
+            disable_level=self.disable_level,
+        )
+
+    def is_enabled_for(self, name, levelno):
+        if levelno <= self.disable_level or name in self.disabled_names:
+            return False
+        return levelno >= self._effective_level(name)
+
+    def _effective_level(self, name):
+        while True:
+            level = self.levels_by_name.get(name)
+            if level is not None:
+                return level
+            if "." not in name:
+                return self.levels_by_name[logging.root.name]
+            name = name.rsplit(".", 1)[0]
+
+
 class WorkerProcessLogHandler(logging.Handler):
-    def __init__(self, queue):
+    """
+    Forwards log records from a worker process to the main process.
+
+    Records that the main process's loggers would ignore are dropped here, so we
+    don't pay to format and transfer them. The remaining records are sent in
+    batches: a batch is sent when it gets large enough, when it has been waiting
+    for ``FLUSH_INTERVAL_SECONDS``, or when a task finishes.
+    """
+
+    MAX_BATCH_SIZE = 100
+    FLUSH_INTERVAL_SECONDS = 0.1
+
+    def __init__(self, queue, logging_levels):
         super(WorkerProcessLogHandler, self).__init__()
         self._queue = queue
+        self._shared_logging_levels = logging_levels
+        self._levels = None
+        self._levels_version = None
+        # Loggers can be created in the worker process that don't exist in the main
+        # process, so we cache the lookup results for each record name.
+        self._is_enabled_cache = {}
+
+        self._batch = []
+        self._flush_timer = None
+
+        self.refresh_levels(None)
+
+    def refresh_levels(self, version):
+        """
+        Fetches the main process's logging levels, unless we already have the
+        specified version.
+        """
+
+        if version is not None and version == self._levels_version:
+            return
+        shared_levels = self._shared_logging_levels.copy()
+        self.acquire()
+        try:
+            self._levels = LoggingLevels.from_dict(shared_levels["levels"])
+            self._levels_version = shared_levels["version"]
+            self._is_enabled_cache = {}
+        finally:
+            self.release()
+
+    def _is_enabled_for(self, record):
+        cache_key = (record.name, record.levelno)
+        is_enabled = self._is_enabled_cache.get(cache_key)
+        if is_enabled is None:
+            is_enabled = self._levels.is_enabled_for(record.name, record.levelno)
+            self._is_enabled_cache[cache_key] = is_enabled
+        return is_enabled
 
     def emit(self, record):
-        # TODO We send all log records to the main process for logging,
-        # even when logging is disabled for their log levels. This is
-        # expensive as we pay IPC cost for the log records and pay the
-        # cost of formatting the log record, which can be costly for
-        # cases where users have a ton of disabled debug logs.
-        # We should investigate if we can either cache the log levels
-        # for each logger or communicate with main process to get the
-        # log level before we decide to send the logs.
+        # The logging framework calls this while holding our lock.
         try:
+            if not self._is_enabled_for(record):
+                return
+
             # By adding the LogRecord to the queue, we send it to the
             # process spawned by the multiprocessing manager. The
             # communication between processes requires every argument
@@ -204,9 +394,39 @@ class WorkerProcessLogHandler(logging.Handler):
             record = copy.copy(record)
             record.msg = record.getMessage()
             record.args = ()
-            self._queue.put_nowait(record)
+            # The traceback objects can't be pickled, so we format them now too.
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            self._batch.append(record)
         except Exception:
             self.handleError(record)
+            return
+
+        if len(self._batch) >= self.MAX_BATCH_SIZE:
+            self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.FLUSH_INTERVAL_SECONDS, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._batch:
+                return
+            batch = self._batch
+            self._batch = []
+            try:
+                self._queue.put_nowait(batch)
+            except Exception:
+                for record in batch:
+                    self.handleError(record)
+        finally:
+            self.release()
 
 
 class LoggingReceiver:
@@ -264,21 +484,32 @@ class LoggingReceiver:
                 self._event_queue_is_empty.clear()
 
             try:
-                record = self._queue.get(timeout=0.05)
+                records = self._queue.get(timeout=0.05)
             except queue.Empty:  # Nothing to receive from the queue.
                 continue
 
+            if not self._handle_records(records):
+                break
+
+    def _handle_records(self, records):
+        """
+        Logs a batch of records received from a worker process. Returns False if
+        the logging system appears to have been shut down.
+        """
+
+        for record in records:
             logger = logging.getLogger(record.name)
             try:
                 if logger.isEnabledFor(record.levelno):
                     logger.handle(record)
             except (BrokenPipeError, EOFError):
-                break
+                return False
             except Exception as e:
                 logger = logging.getLogger()
                 try:
                     logger.warn("exception while logging ", e)
                 except (BrokenPipeError, EOFError):
-                    break
+                    return False
                 except Exception:
                     traceback.print_exc(file=sys.stderr)
+        return True
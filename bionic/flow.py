@@ -32,7 +32,7 @@ from .exception import (
     UnsetEntityError,
     AttributeValidationError,
 )
-from .executor import AipExecutor, ProcessExecutor
+from .executor import AipExecutor, ProcessExecutor, ThreadExecutor
 from .persistence import LocalStore, GcsCloudStore, PersistentCache
 from .provider import (
     ValueProvider,
@@ -1825,13 +1825,19 @@ def create_default_flow_config():
         path = PosixPath(bucket_name) / object_path_str
         return f"gs://{path}"
 
+    builder.assign("core__persistent_cache__local_index__enabled", False, persist=False)
+
     @builder
     @decorators.immediate
     def core__persistent_cache__local_store(
         core__persistent_cache__flow_dir,
+        core__persistent_cache__local_index__enabled,
     ):
         local_flow_dir = core__persistent_cache__flow_dir
-        return LocalStore(local_flow_dir)
+        return LocalStore(
+            local_flow_dir,
+            use_index=core__persistent_cache__local_index__enabled,
+        )
 
     @builder
     @decorators.immediate
@@ -1887,16 +1893,38 @@ def create_default_flow_config():
     builder.assign("core__parallel_execution__enabled", False, persist=False)
     # The executor uses max available CPUs when set to None.
     builder.assign("core__parallel_execution__worker_count", None, persist=False)
+    # Each worker process can keep up to this many bytes of loaded values in memory.
+    builder.assign(
+        "core__parallel_execution__worker_cache_size", 512 * 1024 * 1024, persist=False
+    )
 
     @builder
     @decorators.immediate
     def core__process_executor(
         core__parallel_execution__enabled,
         core__parallel_execution__worker_count,
+        core__parallel_execution__worker_cache_size,
     ):
         if not core__parallel_execution__enabled:
             return None
-        return ProcessExecutor(core__parallel_execution__worker_count)
+        return ProcessExecutor(
+            core__parallel_execution__worker_count,
+            persisted_value_cache_size=core__parallel_execution__worker_cache_size,
+        )
+
+    builder.assign("core__thread_execution__enabled", False, persist=False)
+    # The executor uses a default based on the number of CPUs when set to None.
+    builder.assign("core__thread_execution__worker_count", None, persist=False)
+
+    @builder
+    @decorators.immediate
+    def core__thread_executor(
+        core__thread_execution__enabled,
+        core__thread_execution__worker_count,
+    ):
+        if not core__thread_execution__enabled:
+            return None
+        return ThreadExecutor(core__thread_execution__worker_count)
 
     builder.assign("core__aip_execution__enabled", False, persist=False)
     builder.assign("core__aip_execution__gcp_project_name", None, persist=False)
@@ -7,7 +7,9 @@ import attr
 import cattr
 import os
 import shutil
+import sqlite3
 import tempfile
+import threading
 from typing import List, Optional, Tuple
 import yaml
 import warnings
@@ -92,6 +94,39 @@ class PersistentCache:
     def get_accessor(self, task_key, provenance):
         return CacheAccessor(self, task_key, provenance)
 
+    def prefetch_accessors(self, task_key_provenance_pairs):
+        """
+        Returns a CacheAccessor for each (TaskKey, Provenance) pair, with each
+        accessor's local and cloud entries already looked up.
+
+        This is equivalent to calling ``get_accessor`` on each pair, but the lookups
+        are performed together, which requires far fewer searches of each inventory.
+        """
+
+        accessors = [
+            self.get_accessor(task_key, provenance)
+            for task_key, provenance in task_key_provenance_pairs
+        ]
+        provenances = [accessor.provenance for accessor in accessors]
+
+        try:
+            local_entries = self._local_store.inventory.find_entries(provenances)
+            if self._cloud_store is not None:
+                cloud_entries = self._cloud_store.inventory.find_entries(provenances)
+            else:
+                cloud_entries = [None for _ in accessors]
+        except InternalCacheStateError:
+            # If the cache is in a bad state, we'll let each accessor rediscover the
+            # problem when it needs its entries, so it can be reported properly.
+            return accessors
+
+        for accessor, local_entry, cloud_entry in zip(
+            accessors, local_entries, cloud_entries
+        ):
+            accessor._stored_local_entry = local_entry
+            accessor._stored_cloud_entry = cloud_entry
+        return accessors
+
 
 class CacheAccessor:
     """
@@ -534,6 +569,62 @@ class Inventory:
                 artifact=metadata_record.artifact,
             )
 
+    def find_entries(self, provenances):
+        """
+        Returns a list of InventoryEntries describing the closest match to each of
+        the provided Provenances.
+
+        This is equivalent to calling ``find_entry`` on each provenance, but it
+        searches the inventory once per descriptor rather than once per provenance.
+        """
+
+        # Different descriptors can have provenances with the same hashes, so we
+        # group the provenances by their descriptor URL prefix and keep track of
+        # their positions.
+        provenance_ixs_by_url_prefix = {}
+        for provenance_ix, provenance in enumerate(provenances):
+            url_prefix = self._descriptor_metadata_url_prefix_for_provenance(provenance)
+            provenance_ixs_by_url_prefix.setdefault(url_prefix, []).append(
+                provenance_ix
+            )
+
+        entries = [None] * len(provenances)
+        for url_prefix, provenance_ixs in provenance_ixs_by_url_prefix.items():
+            # For a single provenance, a regular search is narrower and therefore
+            # cheaper.
+            if len(provenance_ixs) == 1:
+                (provenance_ix,) = provenance_ixs
+                entries[provenance_ix] = self.find_entry(provenances[provenance_ix])
+                continue
+
+            logger.debug(
+                "In     %s inventory, searching for %d entries under %s ...",
+                self.tier,
+                len(provenance_ixs),
+                url_prefix,
+            )
+            equivalent_urls_by_url_prefix = {}
+            for url in self._fs.search(url_prefix + "/"):
+                if not url.endswith(".yaml"):
+                    continue
+                # Each metadata URL looks like
+                # <equivalent prefix>/<nominal hash>/<metadata filename>.
+                equivalent_url_prefix = url.rsplit("/", 2)[0]
+                equivalent_urls_by_url_prefix.setdefault(
+                    equivalent_url_prefix, []
+                ).append(url)
+
+            for provenance_ix in provenance_ixs:
+                provenance = provenances[provenance_ix]
+                equivalent_urls = equivalent_urls_by_url_prefix.get(
+                    self._equivalent_metadata_url_prefix_for_provenance(provenance), []
+                )
+                entries[provenance_ix] = self._find_entry_in_equivalent_urls(
+                    provenance, equivalent_urls
+                )
+
+        return entries
+
     def list_items(self):
         metadata_urls = [
             url for url in self._fs.search(self.root_url) if url.endswith(".yaml")
@@ -557,12 +648,52 @@ class Inventory:
         self._fs.rm(url)
         return True
 
+    def _find_entry_in_equivalent_urls(self, provenance, equivalent_urls):
+        """
+        Like ``find_entry``, but uses a pre-computed list of the metadata URLs that
+        equivalently match the provenance. If the best match turns out to be invalid,
+        falls back to a regular search.
+        """
+
+        match = self._best_match_from_equivalent_urls(provenance, equivalent_urls)
+        if not match:
+            logger.debug(
+                "... in %s inventory for %r, found no match", self.tier, provenance
+            )
+            return InventoryEntry(
+                tier=self.tier,
+                provenance=None,
+                exactly_matches_provenance=False,
+                artifact=None,
+            )
+
+        metadata_record = self._load_metadata_if_valid_else_delete(match.metadata_url)
+        if metadata_record is None:
+            return self.find_entry(provenance)
+
+        logger.debug(
+            "... in %s inventory for %r, found %s match at %s",
+            self.tier,
+            provenance,
+            match.level,
+            match.metadata_url,
+        )
+        return InventoryEntry(
+            tier=self.tier,
+            provenance=metadata_record.provenance,
+            exactly_matches_provenance=(match.level == "exact"),
+            artifact=metadata_record.artifact,
+        )
+
     def _find_best_match(self, provenance):
         equivalent_url_prefix = self._equivalent_metadata_url_prefix_for_provenance(
             provenance
         )
         possible_urls = self._fs.search(equivalent_url_prefix)
         equivalent_urls = [url for url in possible_urls if url.endswith(".yaml")]
+        return self._best_match_from_equivalent_urls(provenance, equivalent_urls)
+
+    def _best_match_from_equivalent_urls(self, provenance, equivalent_urls):
         if len(equivalent_urls) == 0:
             return None
 
@@ -590,11 +721,12 @@ class Inventory:
             level="equivalent",
         )
 
+    def _descriptor_metadata_url_prefix_for_provenance(self, provenance):
+        return self._fs.root_url + "/" + valid_filename_from_provenance(provenance)
+
     def _equivalent_metadata_url_prefix_for_provenance(self, provenance):
         return (
-            self._fs.root_url
-            + "/"
-            + valid_filename_from_provenance(provenance)
+            self._descriptor_metadata_url_prefix_for_provenance(provenance)
             + "/"
             + provenance.functional_hash
         )
@@ -657,16 +789,28 @@ class LocalStore:
     Represents the local disk cache.  Provides both an Inventory that manages
     artifact (file) URLs, and a method to generate those URLs (for creating
     new files).
+
+    If ``use_index`` is True, the inventory's metadata files are also tracked in a
+    SQLite index, which lets us find them without searching the directory tree.
     """
 
-    def __init__(self, root_path_str):
+    def __init__(self, root_path_str, use_index=False):
         root_path = Path(root_path_str).absolute()
         self._artifact_root_path = root_path / "artifacts"
 
         inventory_root_path = root_path / "inventory"
         tmp_root_path = root_path / "tmp"
+        if use_index:
+            index = SqliteUrlIndex(
+                db_path=root_path / "inventory_index.sqlite",
+                root_path=inventory_root_path,
+            )
+        else:
+            index = None
         self.inventory = Inventory(
-            "local disk", "local", LocalFilesystem(inventory_root_path, tmp_root_path)
+            "local disk",
+            "local",
+            LocalFilesystem(inventory_root_path, tmp_root_path, index=index),
         )
 
     def generate_unique_dir_path(self, provenance):
@@ -752,16 +896,24 @@ class LocalFilesystem:
     """
     Implements a generic "FileSystem" interface for reading/writing small files
     to local disk.
+
+    If an ``index`` is provided, every file written or removed through this object
+    is also recorded in the index, and searches are answered by the index instead
+    of by walking the directory tree.
     """
 
-    def __init__(self, inventory_dir, tmp_dir):
+    def __init__(self, inventory_dir, tmp_dir, index=None):
         self.root_url = url_from_path(inventory_dir)
         self.tmp_root_path = tmp_dir
+        self._index = index
 
     def exists(self, url):
         return path_from_url(url).exists()
 
     def search(self, url_prefix):
+        if self._index is not None:
+            return self._search_index(url_prefix)
+
         path_prefix = path_from_url(url_prefix)
         if not path_prefix.is_dir():
             return []
@@ -774,6 +926,8 @@ class LocalFilesystem:
     def rm(self, url):
         path = path_from_url(url)
         path.unlink()
+        if self._index is not None:
+            self._index.remove(url)
 
     def write_bytes(self, content_bytes, url):
         path = path_from_url(url)
@@ -789,9 +943,129 @@ class LocalFilesystem:
         finally:
             shutil.rmtree(str(working_dir))
 
+        if self._index is not None:
+            self._index.add(url)
+
     def read_bytes(self, url):
         return path_from_url(url).read_bytes()
 
+    def _search_index(self, url_prefix):
+        # The index can get out of sync with the filesystem if someone deletes files
+        # manually, so we check each result and drop any that have disappeared.
+        urls = []
+        for url in self._index.search(url_prefix):
+            if path_from_url(url).exists():
+                urls.append(url)
+            else:
+                self._index.remove(url)
+        return urls
+
+
+class SqliteUrlIndex:
+    """
+    A persistent, sorted index of the file URLs stored under a local directory,
+    backed by a SQLite database.
+
+    Because the inventory's URLs are built hierarchically from a provenance's
+    descriptor and functional, nominal, and exact hashes, a search for all URLs
+    with a given prefix is a single range query on the index, rather than a
+    recursive walk of the directory.
+
+    The first time the database is opened, it's populated by walking the existing
+    directory tree; after that, it only knows about files that were added or
+    removed through its ``add`` and ``remove`` methods.
+    """
+
+    def __init__(self, db_path, root_path):
+        self.db_path = Path(db_path)
+        self.root_path = Path(root_path)
+
+        # SQLite connections can't be shared across processes or pickled, so we
+        # lazily create one for each thread that uses this index.
+        self._local = threading.local()
+
+    def add(self, url):
+        self._execute("INSERT OR IGNORE INTO urls (url) VALUES (?)", (url,))
+
+    def remove(self, url):
+        self._execute("DELETE FROM urls WHERE url = ?", (url,))
+
+    def search(self, url_prefix):
+        # We want every URL "inside" the prefix, so we look for URLs in the range
+        # [prefix + "/", prefix + "0"); "0" is the character immediately after "/".
+        if url_prefix.endswith("/"):
+            url_prefix = url_prefix[:-1]
+        rows = self._execute(
+            "SELECT url FROM urls WHERE url >= ? AND url < ? ORDER BY url",
+            (url_prefix + "/", url_prefix + "0"),
+        )
+        return [url for (url,) in rows]
+
+    def _execute(self, query, params):
+        with self._connection() as connection:
+            return connection.execute(query, params).fetchall()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        ensure_parent_dir_exists(self.db_path)
+        connection = sqlite3.connect(str(self.db_path), timeout=60)
+        self._initialize_db(connection)
+
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _initialize_db(self, connection):
+        # Several processes may try to initialize the database at the same time, so
+        # we take a write lock before checking whether it's already populated.
+        connection.isolation_level = None
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)"
+            )
+            is_populated = (
+                connection.execute(
+                    "SELECT 1 FROM migrations WHERE name = 'populate_from_files'"
+                ).fetchone()
+                is not None
+            )
+            if not is_populated:
+                logger.debug(
+                    "Populating inventory index %s from files in %s ...",
+                    self.db_path,
+                    self.root_path,
+                )
+                connection.executemany(
+                    "INSERT OR IGNORE INTO urls (url) VALUES (?)",
+                    (
+                        (url_from_path(path),)
+                        for path in self.root_path.glob("**/*")
+                        if path.is_file()
+                    ),
+                )
+                connection.execute(
+                    "INSERT INTO migrations (name) VALUES ('populate_from_files')"
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.isolation_level = ""
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
 
 class GcsFilesystem:
     """
@@ -29,6 +29,7 @@ from .exception import EntityValueError, UnsupportedSerializedValueError
 from .deps.optdep import import_optional_dependency
 from .utils.files import recursively_copy_path
 from .utils.misc import (
+    HashingFileWriter,
     hexdigest_from_path,
     oneline,
     read_hashable_bytes_from_file_or_dir,
@@ -159,7 +160,16 @@ class BaseProtocol:
 
     def tokenize_file(self, path):
         """Like ``tokenize``, but operates on a serialized value."""
-        return tokenization.tokenize(path, read_hashable_bytes_from_file_or_dir)
+        return tokenization.tokenize_file_or_dir(path)
+
+    def write_and_tokenize(self, value, path):
+        """
+        Like ``write``, but also returns the token that ``tokenize_file`` would
+        return for the written file. Protocols that can hash the value while
+        writing it should override this to avoid reading the file back from disk.
+        """
+        self.write(value, path)
+        return self.tokenize_file(path)
 
     def get_extra_value_hash(self, value, suppress_warnings):
         """
@@ -231,6 +241,41 @@ class BaseProtocol:
         return f"{self.__class__.__name__}(...)"
 
 
+# When writing a file, we keep a copy of its contents in memory so we can hash it
+# without reading it back; this is the largest file for which we'll do that.
+MAX_HASH_WHILE_WRITING_SIZE = 32 * 1024 * 1024
+
+
+class SingleFileProtocol(BaseProtocol):
+    """
+    A protocol that serializes each value to a single binary file. Subclasses
+    should implement ``write_to_file``, which writes to a file object rather than
+    a path; this lets us hash the file's contents as they're written.
+    """
+
+    def write_to_file(self, value, file_):
+        """Serializes the object ``value`` to the binary file object ``file_``."""
+        raise NotImplementedError()
+
+    def write(self, value, path):
+        with path.open("wb") as file_:
+            self.write_to_file(value, file_)
+
+    def write_and_tokenize(self, value, path):
+        # If a subclass has customized ``write``, we can't bypass it.
+        if type(self).write is not SingleFileProtocol.write:
+            return super(SingleFileProtocol, self).write_and_tokenize(value, path)
+
+        with path.open("wb") as file_:
+            writer = HashingFileWriter(file_, MAX_HASH_WHILE_WRITING_SIZE)
+            self.write_to_file(value, writer)
+            writer.flush()
+        token = writer.hash_to_hex(tokenization.HASH_LEN)
+        if token is None:
+            token = self.tokenize_file(path)
+        return token
+
+
 class JsonProtocol(BaseProtocol):
     """
     Decorator indicating that an entity's values are built-in types that are
@@ -268,7 +313,7 @@ class JsonProtocol(BaseProtocol):
             return json.load(file_)
 
 
-class PicklableProtocol(BaseProtocol):
+class PicklableProtocol(SingleFileProtocol):
     """
     Decorator indicating that an entity's values can be serialized using the
     ``pickle`` library.
@@ -288,16 +333,15 @@ class PicklableProtocol(BaseProtocol):
     def get_extra_value_hash(self, value, suppress_warnings):
         return CodeHasher.hash(type(value), suppress_warnings)
 
-    def write(self, value, path):
-        with path.open("wb") as file_:
-            pickle.dump(value, file_, protocol=self._pickle_protocol_version)
+    def write_to_file(self, value, file_):
+        pickle.dump(value, file_, protocol=self._pickle_protocol_version)
 
     def read(self, path):
         with path.open("rb") as file_:
             return pickle.load(file_)
 
 
-class DillableProtocol(BaseProtocol):
+class DillableProtocol(SingleFileProtocol):
     """
     Decorator indicating that an entity's values can be serialized using the
     ``dill`` library.
@@ -330,16 +374,15 @@ class DillableProtocol(BaseProtocol):
 
         return self._dill
 
-    def write(self, value, path):
-        with path.open("wb") as file_:
-            self._get_dill_module().dump(value, file_)
+    def write_to_file(self, value, file_):
+        self._get_dill_module().dump(value, file_)
 
     def read(self, path):
         with path.open("rb") as file_:
             return self._get_dill_module().load(file_)
 
 
-class ParquetDataFrameProtocol(BaseProtocol):
+class ParquetDataFrameProtocol(SingleFileProtocol):
     """
     Decorator indicating that an entity's values always have the
     ``pandas.DataFrame`` type.
@@ -366,12 +409,11 @@ class ParquetDataFrameProtocol(BaseProtocol):
         with path.open("rb") as file_:
             return parquet.read_table(file_).to_pandas()
 
-    def write(self, df, path):
+    def write_to_file(self, df, file_):
         self._check_no_duplicate_cols(df)
         if self._check_dtypes:
             self._check_no_categorical_cols(df)
-        with path.open("wb") as file_:
-            parquet.write_table(Table.from_pandas(df), file_)
+        parquet.write_table(Table.from_pandas(df), file_)
 
     def _check_no_duplicate_cols(self, df):
         duplicate_cols = {
@@ -411,7 +453,7 @@ class ParquetDataFrameProtocol(BaseProtocol):
             )
 
 
-class FeatherDataFrameProtocol(BaseProtocol):
+class FeatherDataFrameProtocol(SingleFileProtocol):
     """
     Decorator indicating that an entity's values always have the
     ``pandas.DataFrame`` type.
@@ -429,15 +471,14 @@ class FeatherDataFrameProtocol(BaseProtocol):
         with path.open("rb") as file_:
             return pd.read_feather(file_)
 
-    def write(self, df, path):
-        with path.open("wb") as file_:
-            df.to_feather(file_)
+    def write_to_file(self, df, file_):
+        df.to_feather(file_)
 
 
 Image = import_optional_dependency("PIL.Image", raise_on_missing=False)
 
 
-class ImageProtocol(BaseProtocol):
+class ImageProtocol(SingleFileProtocol):
     """
     Decorator indicating that an entity's values always have the
     ``Pillow.Image`` type.
@@ -466,12 +507,11 @@ class ImageProtocol(BaseProtocol):
             image.load()
             return image
 
-    def write(self, image, path):
-        with path.open("wb") as file_:
-            image.save(file_, format="png")
+    def write_to_file(self, image, file_):
+        image.save(file_, format="png")
 
 
-class NumPyProtocol(BaseProtocol):
+class NumPyProtocol(SingleFileProtocol):
     """
     Decorator indicating that an entity's values always have the
     ``numpy.ndarray`` type.
@@ -489,9 +529,8 @@ class NumPyProtocol(BaseProtocol):
         with path.open("rb") as file_:
             return np.load(file_)
 
-    def write(self, array, path):
-        with path.open("wb") as file_:
-            np.save(file_, array)
+    def write_to_file(self, array, file_):
+        np.save(file_, array)
 
 
 dd = import_optional_dependency("dask.dataframe", raise_on_missing=False)
@@ -762,6 +801,9 @@ class CombinedProtocol(BaseProtocol):
     def write(self, value, path):
         self._protocol_for_value(value).write(value, path)
 
+    def write_and_tokenize(self, value, path):
+        return self._protocol_for_value(value).write_and_tokenize(value, path)
+
     def __repr__(self):
         return "CombinedProtocol(...)"
 
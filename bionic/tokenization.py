@@ -3,7 +3,7 @@ Contains a tokenize() function which can be used to convert arbitrary values
 into nice strings, suitable for use as filenames.
 """
 
-from .utils.misc import hash_to_hex
+from .utils.misc import hash_to_hex, hash_file_or_dir_to_hex
 
 
 def char_range(first, last):
@@ -66,3 +66,15 @@ def tokenize(value, serialize_func=None):
             token += "_" + hash_to_hex(value_str.encode("utf-8"), HASH_LEN)
 
     return token
+
+
+def tokenize_file_or_dir(path):
+    """
+    Converts the contents of a file or directory to a unique hash string. The
+    contents are streamed through the hash function, so this works for files much
+    larger than the available memory.
+
+    Equivalent to ``tokenize(path, read_hashable_bytes_from_file_or_dir)``.
+    """
+
+    return hash_file_or_dir_to_hex(path, HASH_LEN)
@@ -32,3 +32,14 @@ def recursively_delete_path(path):
         path.unlink()
     else:
         shutil.rmtree(path)
+
+
+def get_path_size(path):
+    """
+    Returns the total size in bytes of a file, or of all the files in a directory.
+    """
+    if path.is_file():
+        return path.stat().st_size
+    return sum(
+        sub_path.stat().st_size for sub_path in path.rglob("*") if sub_path.is_file()
+    )
@@ -2,9 +2,11 @@
 Miscellaneous utility functions.
 """
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from hashlib import sha256
 from binascii import hexlify
+import io
+import os
 import re
 import threading
 
@@ -98,6 +100,14 @@ def single_unique_element(iterable):
 def hash_to_hex(bytestring, n_bytes=None):
     hash_ = sha256()
     hash_.update(bytestring)
+    return hex_from_hash(hash_, n_bytes)
+
+
+def hex_from_hash(hash_, n_bytes=None):
+    """
+    Returns the digest of a hashlib hash object as a hex string, optionally
+    truncated to the first ``n_bytes`` bytes.
+    """
     hex_str = hexlify(hash_.digest()).decode("utf-8")
 
     if n_bytes is not None:
@@ -123,20 +133,72 @@ def num_as_bytes(n):
     return str(n).encode("utf-8")
 
 
+class _BytesAccumulator:
+    """
+    Collects bytes passed to ``update``, mimicking the interface of a hashlib hash
+    object.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def update(self, bytestring):
+        self._chunks.append(bytestring)
+
+    def value(self):
+        return b"".join(self._chunks)
+
+
 def read_hashable_bytes_from_file_or_dir(path):
     """
     Reads the contents of a file or directory (and all nested
     files/directories) into a single byte array.  This function is intended to
     generate the input to a hash function, so it includes some extra metadata
     to reduce the chance of collisions.
+
+    This loads everything into memory; if you just want a hash of the contents,
+    ``hash_file_or_dir_to_hex`` computes the same hash without doing that.
+    """
+    accumulator = _BytesAccumulator()
+    update_hash_from_file_or_dir(accumulator, path)
+    return accumulator.value()
+
+
+def hash_file_or_dir_to_hex(path, n_bytes=None):
+    """
+    Equivalent to ``hash_to_hex(read_hashable_bytes_from_file_or_dir(path),
+    n_bytes)``, but streams the contents of each file into the hash instead of
+    reading everything into memory.
+    """
+    hash_ = sha256()
+    update_hash_from_file_or_dir(hash_, path)
+    return hex_from_hash(hash_, n_bytes)
+
+
+# This chunk size is big enough to keep the per-chunk overhead negligible without
+# using much memory.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def update_hash_from_file_or_dir(hash_, path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Feeds the contents of a file or directory (and all nested files/directories)
+    into a hashlib-style hash object, one chunk at a time. The bytes passed to the
+    hash are the same ones returned by ``read_hashable_bytes_from_file_or_dir``.
     """
     if not path.exists():
         raise ValueError(f"{path!r} doesn't exist")
     elif path.is_file():
-        # TODO This file could be large, so it would be better not to read the whole
-        # thing into memory. We could probably implement this whole function as a
-        # streaming algorithm instead.
-        return b"F" + num_as_bytes(path.stat().st_size) + b":" + path.read_bytes()
+        with path.open("rb") as file_:
+            # We use the size from the open file descriptor, so it's consistent with
+            # the bytes we actually read.
+            size = os.fstat(file_.fileno()).st_size
+            hash_.update(b"F" + num_as_bytes(size) + b":")
+            while True:
+                chunk_bytes = file_.read(chunk_size)
+                if len(chunk_bytes) == 0:
+                    break
+                hash_.update(chunk_bytes)
     elif path.is_dir():
         # We could just concatenate all the file byte strings together, but
         # since we expect to hash this, it'd be nice to avoid returning the
@@ -146,20 +208,18 @@ def read_hashable_bytes_from_file_or_dir(path):
         # accomplish this, we prefix each type of data with a letter and the
         # length of the data.
         sub_paths = list(sorted(path.iterdir()))
-        return (
-            b"D"
-            + num_as_bytes(len(sub_paths))
-            + b":"
-            + b":".join(
+        hash_.update(b"D" + num_as_bytes(len(sub_paths)) + b":")
+        for i, sub_path in enumerate(sub_paths):
+            if i > 0:
+                hash_.update(b":")
+            hash_.update(
                 b"N"
                 + num_as_bytes(len(sub_path.name))
                 + b":"
                 + sub_path.name.encode("UTF-8")
                 + b":"
-                + read_hashable_bytes_from_file_or_dir(sub_path)
-                for sub_path in sub_paths
             )
-        )
+            update_hash_from_file_or_dir(hash_, sub_path, chunk_size)
     else:
         raise ValueError(
             oneline(
@@ -170,6 +230,76 @@ def read_hashable_bytes_from_file_or_dir(path):
         )
 
 
+class HashingFileWriter(io.BufferedIOBase):
+    """
+    A writable binary file object that forwards everything written to it to another
+    file object, while also keeping track of the bytes needed to compute
+    ``hash_file_or_dir_to_hex`` for the resulting file. This lets us hash a newly
+    written file without reading it back from disk.
+
+    Because the hashable representation of a file starts with the file's size, we
+    can't feed the contents to the hash until the file is complete; instead, we
+    keep a copy of the written bytes in memory. If the file grows larger than
+    ``max_buffer_size``, or if the writer seeks to a different position, we give up
+    on hashing and ``hash_to_hex`` returns None.
+    """
+
+    def __init__(self, file_, max_buffer_size):
+        super(HashingFileWriter, self).__init__()
+
+        self._file = file_
+        self._max_buffer_size = max_buffer_size
+        self._buffer = bytearray()
+
+    @property
+    def can_hash(self):
+        return self._buffer is not None
+
+    def writable(self):
+        return True
+
+    def write(self, bytestring):
+        n_bytes_written = self._file.write(bytestring)
+        if n_bytes_written is None:
+            n_bytes_written = len(bytestring)
+        if self._buffer is not None:
+            if len(self._buffer) + n_bytes_written > self._max_buffer_size:
+                self._buffer = None
+            else:
+                self._buffer += memoryview(bytestring)[:n_bytes_written]
+        return n_bytes_written
+
+    def tell(self):
+        return self._file.tell()
+
+    def seekable(self):
+        return self._file.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        position = self._file.seek(offset, whence)
+        if self._buffer is not None and position != len(self._buffer):
+            self._buffer = None
+        return position
+
+    def flush(self):
+        # We don't own the wrapped file, so it may already be closed by the time
+        # this object is closed (and flushed).
+        if not self._file.closed:
+            self._file.flush()
+
+    def hash_to_hex(self, n_bytes=None):
+        """
+        Returns the same value as ``hash_file_or_dir_to_hex`` would for the written
+        file, or None if we weren't able to keep track of the file's contents.
+        """
+        if self._buffer is None:
+            return None
+        hash_ = sha256()
+        hash_.update(b"F" + num_as_bytes(len(self._buffer)) + b":")
+        hash_.update(self._buffer)
+        return hex_from_hash(hash_, n_bytes)
+
+
 def hash_simple_obj_to_hex(obj):
     """
     Generates a hash digest of an object, as a hex string.  The object must
@@ -409,3 +539,63 @@ class SynchronizedSet:
 
     def contains(self, value):
         return value in self.values
+
+
+class SizeBoundedLruCache:
+    """
+    A key-value cache whose values each have an associated size. When the total size
+    of the values exceeds ``max_size``, the least recently used values are evicted
+    until the total fits again. Values larger than ``max_size`` are never stored.
+    """
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._values_and_sizes_by_key = OrderedDict()
+        self.total_size = 0
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, max_size):
+        self._max_size = max_size
+        self._evict_if_necessary()
+
+    def get(self, key, default=None):
+        """
+        Returns the value for a key (marking it as recently used), or ``default`` if
+        it's not present.
+        """
+        if key not in self._values_and_sizes_by_key:
+            return default
+        self._values_and_sizes_by_key.move_to_end(key)
+        value, _ = self._values_and_sizes_by_key[key]
+        return value
+
+    def put(self, key, value, size):
+        """Stores a value with the given size, evicting other values if necessary."""
+        self.discard(key)
+        if size > self._max_size:
+            return
+        self._values_and_sizes_by_key[key] = (value, size)
+        self.total_size += size
+        self._evict_if_necessary()
+
+    def discard(self, key):
+        """Removes a key if it's present."""
+        if key not in self._values_and_sizes_by_key:
+            return
+        _, size = self._values_and_sizes_by_key.pop(key)
+        self.total_size -= size
+
+    def _evict_if_necessary(self):
+        while self.total_size > self._max_size:
+            _, (_, size) = self._values_and_sizes_by_key.popitem(last=False)
+            self.total_size -= size
+
+    def __contains__(self, key):
+        return key in self._values_and_sizes_by_key
+
+    def __len__(self):
+        return len(self._values_and_sizes_by_key)
@@ -14,7 +14,7 @@ def loky_executor():
     return loky.get_reusable_executor(
         max_workers=None,
         initializer=logging_initializer,
-        initargs=(get_singleton_manager().logging_queue,),
+        initargs=get_singleton_manager().logging_initargs,
     )
 
 
@@ -56,6 +56,47 @@ def test_executor_resizes(builder, loky_executor):
     assert loky_executor._max_workers == 2
 
 
+@pytest.mark.parametrize("worker_cache_size", [0, 1024 * 1024])
+def test_worker_reuses_loaded_values(builder, make_counter, worker_cache_size):
+    read_counter = make_counter()
+
+    class ReadCountingProtocol(bn.protocols.PicklableProtocol):
+        def read(self, path):
+            read_counter.mark()
+            return super(ReadCountingProtocol, self).read(path)
+
+    # With a single worker, every task runs in the same process.
+    builder.set("core__parallel_execution__worker_count", 1)
+    builder.set("core__parallel_execution__worker_cache_size", worker_cache_size)
+
+    @builder
+    @ReadCountingProtocol()
+    def x():
+        return 1
+
+    @builder
+    def y1(x):
+        return x + 1
+
+    @builder
+    def y2(x):
+        return x + 2
+
+    @builder
+    def y3(x):
+        return x + 3
+
+    @builder
+    def total(y1, y2, y3):
+        return y1 + y2 + y3
+
+    assert builder.build().get("total") == 9
+    if worker_cache_size > 0:
+        assert read_counter.times_called() == 1
+    else:
+        assert read_counter.times_called() > 1
+
+
 # Test that when bionic sends a job to a parallel or AIP executor, it does not
 # need to wait for the results and can send more jobs to executors.
 # Test only runs in fake AIP because it uses SyncManager Barrier.
@@ -3,6 +3,8 @@ import threading
 
 import pytest
 
+from bionic.executor import LoggingLevels
+
 
 @pytest.mark.allows_parallel
 def test_logging_details(builder, log_checker, parallel_execution_enabled):
@@ -16,6 +18,11 @@ def test_logging_details(builder, log_checker, parallel_execution_enabled):
     progress reporting instead of using logs.
     """
 
+    # Whether a worker process has a value in its in-memory cache depends on which
+    # worker ran the previous task, so we disable that cache to keep the messages
+    # deterministic.
+    builder.set("core__parallel_execution__worker_cache_size", 0)
+
     builder.assign("x", 1)
 
     @builder
@@ -38,7 +45,8 @@ def test_logging_details(builder, log_checker, parallel_execution_enabled):
 
     if parallel_execution_enabled:
         # This is different from serial execution because we don't pass
-        # in-memory cache to the subprocesses. The subprocess loads the
+        # in-memory cache to the subprocesses (and we disabled the workers' own
+        # cache above). The subprocess loads the
         # entities from disk cache instead.
         log_checker.expect_all(
             "Loaded     x_plus_one(x=1) from disk cache",
@@ -102,3 +110,52 @@ def test_log_unpickleable_value(builder, log_checker):
         "Logging unpickleable class: Cannot pickle me",
         "Computed   log_unpickleable_value()",
     )
+
+
+@pytest.mark.allows_parallel
+def test_disabled_log_levels_are_not_forwarded(builder, log_checker):
+    @builder
+    def chatty_value():
+        chatty_logger = logging.getLogger("bionic_test_chatty_library")
+        for i in range(3):
+            chatty_logger.debug("Debug message %s", i)
+        chatty_logger.info("Info message")
+        try:
+            raise ValueError("oops")
+        except ValueError:
+            chatty_logger.exception("Exception message")
+        return 5
+
+    assert builder.build().get("chatty_value") == 5
+
+    log_checker.expect_all(
+        "Computing  chatty_value() ...",
+        "Info message",
+        "Exception message",
+        "Computed   chatty_value()",
+    )
+
+
+def test_logging_levels_snapshot():
+    parent_logger = logging.getLogger("bionic_test_levels")
+    child_logger = logging.getLogger("bionic_test_levels.child")
+    disabled_logger = logging.getLogger("bionic_test_levels.disabled")
+    parent_logger.setLevel(logging.WARNING)
+    child_logger.setLevel(logging.DEBUG)
+    disabled_logger.disabled = True
+    try:
+        levels = LoggingLevels.from_current_process()
+    finally:
+        parent_logger.setLevel(logging.NOTSET)
+        child_logger.setLevel(logging.NOTSET)
+        disabled_logger.disabled = False
+
+    assert LoggingLevels.from_dict(levels.as_dict()) == levels
+
+    assert not levels.is_enabled_for("bionic_test_levels", logging.INFO)
+    assert levels.is_enabled_for("bionic_test_levels", logging.WARNING)
+    assert levels.is_enabled_for("bionic_test_levels.child", logging.DEBUG)
+    assert not levels.is_enabled_for("bionic_test_levels.disabled", logging.CRITICAL)
+    # Loggers that don't exist yet inherit the level of their nearest ancestor.
+    assert not levels.is_enabled_for("bionic_test_levels.new", logging.INFO)
+    assert levels.is_enabled_for("bionic_test_levels.child.new", logging.DEBUG)
@@ -1714,6 +1714,86 @@ def test_caching_dir_with_whitespaces(builder, make_counter, tmp_path):
     assert counter.times_called() == 1
 
 
+def test_local_index(builder, make_counter, tmp_path):
+    builder.set("core__persistent_cache__local_index__enabled", True)
+    builder.assign("x", values=[2, 3])
+
+    counter = make_counter()
+
+    @builder
+    @counter
+    def x_squared(x):
+        return x ** 2
+
+    assert builder.build().get("x_squared", set) == {4, 9}
+    assert builder.build().get("x_squared", set) == {4, 9}
+    assert counter.times_called() == 2
+    assert (tmp_path / "BNTESTDATA" / "inventory_index.sqlite").is_file()
+
+    builder.set("x", values=[2, 3, 4])
+    assert builder.build().get("x_squared", set) == {4, 9, 16}
+    assert counter.times_called() == 1
+
+    # Deleting files behind the index's back should be handled gracefully.
+    flow = builder.build()
+    for entry in flow.cache.get_entries():
+        if entry.entity == "x_squared":
+            entry.metadata_path.unlink()
+    assert builder.build().get("x_squared", set) == {4, 9, 16}
+    assert counter.times_called() == 3
+
+
+def test_cache_lookups_are_batched(builder, make_counter, monkeypatch):
+    from bionic.persistence import LocalFilesystem
+
+    builder.assign("x", values=list(range(20)))
+
+    counter = make_counter()
+
+    @builder
+    @counter
+    def x_plus_one(x):
+        return x + 1
+
+    @builder
+    def x_plus_two(x_plus_one):
+        return x_plus_one + 1
+
+    expected_values = {x + 2 for x in range(20)}
+    assert builder.build().get("x_plus_two", set) == expected_values
+    assert counter.times_called() == 20
+
+    searched_url_prefixes = []
+    original_search = LocalFilesystem.search
+
+    def search(self, url_prefix):
+        searched_url_prefixes.append(url_prefix)
+        return original_search(self, url_prefix)
+
+    monkeypatch.setattr(LocalFilesystem, "search", search)
+
+    assert builder.build().get("x_plus_two", set) == expected_values
+    assert counter.times_called() == 0
+    # Without batching, we'd search separately for each of the 20 values.
+    assert len(searched_url_prefixes) <= 3
+
+
+def test_local_index_populated_from_existing_cache(builder, make_counter):
+    counter = make_counter()
+
+    @builder
+    @counter
+    def one():
+        return 1
+
+    assert builder.build().get("one") == 1
+    assert counter.times_called() == 1
+
+    builder.set("core__persistent_cache__local_index__enabled", True)
+    assert builder.build().get("one") == 1
+    assert counter.times_called() == 0
+
+
 @pytest.fixture
 def make_tracked_class():
     """
@@ -732,3 +732,46 @@ def test_set_with_duplicate_pickle_output(builder, make_counter, set_type):
         assert all(isinstance(dummy, Dummy) for dummy in dummies)
 
     assert counter.times_called() == 1
+
+
+@pytest.mark.parametrize(
+    "protocol, value",
+    [
+        (bn.protocols.PicklableProtocol(), {"a": 1, "b": [2, 3]}),
+        (bn.protocols.DillableProtocol(), lambda x: x + 1),
+        (bn.protocols.JsonProtocol(), {"a": 1, "b": [2, 3]}),
+        (
+            bn.protocols.ParquetDataFrameProtocol(),
+            pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]}),
+        ),
+        (
+            bn.protocols.FeatherDataFrameProtocol(),
+            pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]}),
+        ),
+        (bn.protocols.ImageProtocol(), Image.new("RGB", (4, 4))),
+        (bn.protocols.NumPyProtocol(), np.arange(100).reshape(10, 10)),
+        (bn.protocols.PicklableSetProtocol(), {1, 2, 3}),
+        (
+            CombinedProtocol(
+                bn.protocols.NumPyProtocol(), bn.protocols.PicklableProtocol()
+            ),
+            np.arange(10),
+        ),
+    ],
+)
+def test_write_and_tokenize_matches_tokenize_file(tmp_path, protocol, value):
+    path = tmp_path / f"value.{protocol.file_extension_for_value(value)}"
+
+    token = protocol.write_and_tokenize(value, path)
+
+    assert token == protocol.tokenize_file(path)
+
+
+def test_write_and_tokenize_falls_back_for_large_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(bn.protocols, "MAX_HASH_WHILE_WRITING_SIZE", 10)
+    protocol = bn.protocols.NumPyProtocol()
+    path = tmp_path / "value.npy"
+
+    token = protocol.write_and_tokenize(np.arange(100), path)
+
+    assert token == protocol.tokenize_file(path)
@@ -0,0 +1,106 @@
+import pytest
+
+import threading
+
+import bionic as bn
+from bionic.exception import EntityComputationError
+
+# These tests use thread synchronization objects that can't be sent to other
+# processes, and anyway they're about threads, not processes.
+pytestmark = pytest.mark.no_parallel
+
+
+@pytest.fixture
+def builder(builder):
+    builder.set("core__thread_execution__enabled", True)
+    builder.set("core__thread_execution__worker_count", 2)
+    return builder
+
+
+@pytest.mark.parametrize("persist", [True, False])
+def test_independent_entities_run_concurrently(builder, persist):
+    # Each of these functions waits until both are running, so this test can only
+    # pass if they're computed at the same time.
+    barrier = threading.Barrier(2, timeout=10)
+
+    builder.assign("x", 1)
+
+    @builder
+    @bn.persist(persist)
+    def y1(x):
+        barrier.wait()
+        return x + 1
+
+    @builder
+    @bn.persist(persist)
+    def y2(x):
+        barrier.wait()
+        return x + 2
+
+    @builder
+    def z(y1, y2):
+        return y1 + y2
+
+    assert builder.build().get("z") == 5
+
+
+def test_thread_execution_results_and_caching(builder, make_counter):
+    call_counter = make_counter()
+
+    builder.assign("x", values=[1, 2, 3])
+
+    @builder
+    @call_counter
+    def x_squared(x):
+        return x ** 2
+
+    @builder
+    @bn.persist(False)
+    def x_cubed(x, x_squared):
+        return x * x_squared
+
+    @builder
+    @bn.gather(over="x", also=["x_squared", "x_cubed"], into="df")
+    def total(df):
+        return df["x_squared"].sum() + df["x_cubed"].sum()
+
+    flow = builder.build()
+    assert flow.get("total") == (1 + 4 + 9) + (1 + 8 + 27)
+    assert call_counter.times_called() == 3
+
+    flow = builder.build()
+    assert flow.get("total") == (1 + 4 + 9) + (1 + 8 + 27)
+    assert call_counter.times_called() == 0
+
+
+def test_unpicklable_values_are_shared_between_threads(builder):
+    builder.assign("x", 1)
+
+    @builder
+    @bn.persist(False)
+    def lock():
+        return threading.Lock()
+
+    @builder
+    @bn.persist(False)
+    def lock_id_1(lock, x):
+        return id(lock)
+
+    @builder
+    @bn.persist(False)
+    def lock_id_2(lock, x):
+        return id(lock)
+
+    flow = builder.build()
+    assert flow.get("lock_id_1") == flow.get("lock_id_2") == id(flow.get("lock"))
+
+
+def test_thread_execution_error(builder):
+    builder.assign("x", 1)
+
+    @builder
+    def y(x):
+        raise ValueError("y failed")
+
+    with pytest.raises(EntityComputationError):
+        builder.build().get("y")
@@ -230,3 +230,115 @@ def test_clean_docstring():
     two
     """
     assert rewrap_docstring(doc) == "test\n- one\ntwo"
+
+
+def test_hash_file_or_dir(tmp_path):
+    from bionic.utils.misc import (
+        hash_file_or_dir_to_hex,
+        hash_to_hex,
+        read_hashable_bytes_from_file_or_dir,
+        update_hash_from_file_or_dir,
+    )
+    from hashlib import sha256
+
+    (tmp_path / "file.txt").write_bytes(b"AB")
+    (tmp_path / "empty").write_bytes(b"")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a").write_bytes(b"A")
+    (tmp_path / "sub" / "b").write_bytes(b"B" * 10000)
+    (tmp_path / "sub" / "nested").mkdir()
+
+    # These hashes were generated by the original, non-streaming implementation;
+    # if they change, existing cache entries will no longer be recognized.
+    file_hash = "e489ac4b2c3c81ef864a2454ac6d44a62c612c8bef00a8f1a032c623482c017c"
+    dir_hash = "16664ff7efd8b4561e527b72e7cd819cc8f3dc7d683e55e7eaa894e42dd1072e"
+
+    assert hash_file_or_dir_to_hex(tmp_path / "file.txt") == file_hash
+    assert hash_file_or_dir_to_hex(tmp_path) == dir_hash
+    assert hash_file_or_dir_to_hex(tmp_path, n_bytes=5) == dir_hash[:10]
+
+    for path in [tmp_path / "file.txt", tmp_path / "sub", tmp_path]:
+        assert hash_file_or_dir_to_hex(path) == hash_to_hex(
+            read_hashable_bytes_from_file_or_dir(path)
+        )
+
+    # The chunk size shouldn't affect the result.
+    hash_ = sha256()
+    update_hash_from_file_or_dir(hash_, tmp_path, chunk_size=3)
+    assert hash_.hexdigest() == dir_hash
+
+    with pytest.raises(ValueError):
+        hash_file_or_dir_to_hex(tmp_path / "missing")
+
+
+def test_hashing_file_writer(tmp_path):
+    from bionic.utils.misc import HashingFileWriter, hash_file_or_dir_to_hex
+
+    path = tmp_path / "file"
+    with path.open("wb") as file_:
+        writer = HashingFileWriter(file_, max_buffer_size=100)
+        writer.write(b"AB")
+        writer.write(bytearray(b"CD"))
+        assert writer.tell() == 4
+    assert writer.hash_to_hex() == hash_file_or_dir_to_hex(path)
+    assert writer.hash_to_hex(n_bytes=5) == hash_file_or_dir_to_hex(path, n_bytes=5)
+
+    # If the file gets too large, we give up on hashing it.
+    with path.open("wb") as file_:
+        writer = HashingFileWriter(file_, max_buffer_size=3)
+        writer.write(b"AB")
+        writer.write(b"CD")
+    assert not writer.can_hash
+    assert writer.hash_to_hex() is None
+    assert path.read_bytes() == b"ABCD"
+
+    # Same if the writer seeks backwards and overwrites part of the file.
+    with path.open("wb") as file_:
+        writer = HashingFileWriter(file_, max_buffer_size=100)
+        writer.write(b"ABCD")
+        writer.seek(1)
+        writer.write(b"X")
+    assert writer.hash_to_hex() is None
+    assert path.read_bytes() == b"AXCD"
+
+
+def test_size_bounded_lru_cache():
+    from bionic.utils.misc import SizeBoundedLruCache
+
+    cache = SizeBoundedLruCache(max_size=10)
+    cache.put("a", 1, size=4)
+    cache.put("b", 2, size=4)
+    assert cache.get("a") == 1
+    assert cache.get("b") == 2
+    assert cache.total_size == 8
+
+    # Adding "c" should evict the least recently used value, which is "a".
+    assert cache.get("a") == 1
+    assert cache.get("b") == 2
+    cache.put("c", 3, size=4)
+    assert "a" not in cache
+    assert cache.get("b") == 2
+    assert cache.get("c") == 3
+    assert cache.total_size == 8
+
+    # Replacing a value updates its size.
+    cache.put("c", 4, size=2)
+    assert cache.get("c") == 4
+    assert cache.total_size == 6
+
+    # Values that are too big are never stored.
+    cache.put("d", 5, size=11)
+    assert "d" not in cache
+    assert cache.get("d", "missing") == "missing"
+    assert len(cache) == 2
+
+    # Shrinking the cache evicts values.
+    cache.max_size = 3
+    assert "b" not in cache
+    assert cache.get("c") == 4
+    assert cache.total_size == 2
+
+    cache.discard("c")
+    cache.discard("c")
+    assert len(cache) == 0
+    assert cache.total_size == 0